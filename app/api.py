@@ -0,0 +1,207 @@
+"""
+HTTP extraction service (alongside the Streamlit UI).
+
+Run:
+    uvicorn app.api:app --host 0.0.0.0 --port 8090
+
+Endpoints:
+    GET  /health
+    GET  /banks
+    POST /extract         multipart: files (PDFs), banks, [confidence_threshold], [cascade]
+    POST /extract/stream  same form, answers with Server-Sent Events:
+                          "partial" per extraction chunk, "bank" per finished bank, then "done"
+
+LLM calls run on one process-wide thread pool (SERVICE_WORKERS, default 8);
+PDF text extraction is CPU-bound and holds the GIL, so it runs on a process
+pool (SERVICE_PDF_PROCESSES, default: CPU count) started via forkserver. Both
+pools are shut down with the app. The Gemini client is shared via
+backend.llm.get_client. Set LLM_BACKEND=fake to run without Gemini.
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+
+from backend.bank_registry import load_bank_registry
+from backend.doc_store import open_session
+from backend.orchestrator import process_bank
+from backend.pdf_text import extract_text_from_uploads
+
+app = FastAPI(title="Mortgage AI Form Filler")
+
+_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SERVICE_WORKERS", "8")),
+    thread_name_prefix="extract",
+)
+# forkserver: forking the server process would copy its threads' lock state
+_PDF_POOL = ProcessPoolExecutor(
+    max_workers=int(os.getenv("SERVICE_PDF_PROCESSES", "0")) or None,
+    mp_context=multiprocessing.get_context("forkserver"),
+)
+
+
+@app.on_event("shutdown")
+def _shutdown_pools() -> None:
+    _POOL.shutdown(wait=False, cancel_futures=True)
+    _PDF_POOL.shutdown(wait=True, cancel_futures=True)
+
+
+def _parse_banks(banks: List[str]) -> List[str]:
+    # accept repeated fields and/or comma-separated values
+    out = []
+    for b in banks:
+        out.extend(x.strip() for x in b.split(",") if x.strip())
+    return out
+
+
+async def _read_request(files: List[UploadFile], banks: List[str]) -> Tuple[List[str], List[Tuple[str, bytes]]]:
+    selected = _parse_banks(banks)
+    if not selected:
+        raise HTTPException(status_code=400, detail="No banks selected")
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+
+    try:
+        known = set(load_bank_registry()["bank"].dropna().unique().tolist())
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Bank registry not available: {e}")
+    unknown = [b for b in selected if b not in known]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown bank(s): {', '.join(unknown)}")
+
+    pdfs = []
+    for i, f in enumerate(files, start=1):
+        pdfs.append((f.filename or f"file_{i}.pdf", await f.read()))
+    return selected, pdfs
+
+
+class InvalidUpload(ValueError):
+    """An uploaded file could not be parsed as a PDF."""
+
+
+def _pdf_text(pdfs: List[Tuple[str, bytes]]) -> str:
+    # one file at a time so a parse failure can name the offending upload
+    parts = []
+    for name, data in pdfs:
+        s = io.BytesIO(data)
+        s.name = name
+        try:
+            text, _names = extract_text_from_uploads([s])
+        except Exception as e:
+            raise InvalidUpload(f"Could not read '{name}' as a PDF: {e}") from None
+        parts.append(text)
+    return "\n\n".join(p for p in parts if p)
+
+
+async def _run_banks(
+    selected: List[str],
+    pdfs: List[Tuple[str, bytes]],
+    confidence_threshold: float,
+    cascade: Optional[bool],
+    queue: Optional[asyncio.Queue] = None,
+) -> Dict[str, Any]:
+    """
+    Extract text once, then process every bank concurrently on the pool.
+    Partial updates / finished payloads are pushed to `queue` when given.
+    """
+    loop = asyncio.get_running_loop()
+
+    # Move the uploads into the shared doc store for the request's lifetime,
+    # so identical bundles submitted concurrently are held once.
+    session = open_session()
+    refs = [(name, session.put(data)) for name, data in pdfs]
+    pdfs.clear()
+    try:
+        try:
+            pdf_text = await loop.run_in_executor(
+                _PDF_POOL, _pdf_text, [(name, session.store.get(h)) for name, h in refs]
+            )
+        except InvalidUpload as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        def emit(event: str, data: Dict[str, Any]) -> None:
+            if queue is not None:
+                loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+        def run(bank: str) -> Dict[str, Any]:
+            try:
+                payload = process_bank(
+                    bank_name=bank,
+                    pdf_text=pdf_text,
+                    uploaded_pdfs=[(name, session.store.get(h)) for name, h in refs],
+                    confidence_threshold=confidence_threshold,
+                    on_partial_update=lambda b, fields: emit("partial", {"bank": b, "fields": fields}),
+                    cascade=cascade,
+                )
+            except Exception as e:
+                payload = {"bank": bank, "fields": {}, "missing_fields": [], "error": str(e)}
+            emit("bank", payload)
+            return payload
+
+        results = await asyncio.gather(*[loop.run_in_executor(_POOL, run, b) for b in selected])
+        return {p["bank"]: p for p in results}
+    finally:
+        session.close()
+
+
+@app.get("/health")
+async def health() -> Dict[str, Any]:
+    return {"status": "ok"}
+
+
+@app.get("/banks")
+async def banks() -> Dict[str, Any]:
+    try:
+        reg = load_bank_registry()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Bank registry not available: {e}")
+    return {"banks": sorted(reg["bank"].dropna().unique().tolist())}
+
+
+@app.post("/extract")
+async def extract(
+    files: List[UploadFile] = File(...),
+    banks: List[str] = Form(...),
+    confidence_threshold: float = Form(0.6),
+    cascade: Optional[bool] = Form(None),
+) -> Dict[str, Any]:
+    selected, pdfs = await _read_request(files, banks)
+    outputs = await _run_banks(selected, pdfs, confidence_threshold, cascade)
+    return {"outputs": outputs}
+
+
+@app.post("/extract/stream")
+async def extract_stream(
+    files: List[UploadFile] = File(...),
+    banks: List[str] = Form(...),
+    confidence_threshold: float = Form(0.6),
+    cascade: Optional[bool] = Form(None),
+) -> StreamingResponse:
+    selected, pdfs = await _read_request(files, banks)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def events() -> AsyncIterator[str]:
+        task = asyncio.create_task(_run_banks(selected, pdfs, confidence_threshold, cascade, queue))
+        task.add_done_callback(lambda _t: queue.put_nowait(("done", None)))
+        while True:
+            event, data = await queue.get()
+            if event == "done":
+                break
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        try:
+            await task
+        except HTTPException as e:
+            yield f"event: error\ndata: {json.dumps({'error': e.detail, 'status': e.status_code})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
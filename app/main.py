@@ -11,8 +11,9 @@ import pandas as pd
 import streamlit as st
 
 from backend.pdf_text import extract_text_from_uploads
-from backend.orchestrator import process_bank
+from backend.orchestrator import process_bank, process_bank_incremental
 from backend.bank_registry import load_bank_registry
+from backend.doc_store import get_document_store, materialize, open_session
 
 
 st.set_page_config(page_title="Mortgage AI Form Filler", layout="wide")
@@ -30,11 +31,19 @@ st.markdown(
 st.title("Mortgage AI Form Filler")
 
 # ---- Session state ----
+# Documents and extracted text live in the process-wide doc store; the session
+# only keeps content hashes. The DocSession handle releases them when the
+# session state is dropped.
+if "doc_session" not in st.session_state:
+    st.session_state.doc_session = open_session()
+
 for key, default in {
-    "pdf_text": "",
+    "pdf_text_ref": None,
     "doc_names": [],
-    "uploaded_pdf_bytes": [],
+    "doc_refs": [],
+    "doc_text_refs": {},
     "outputs": {},
+    "extracted_refs": [],
     "chat": [],
     "chat_bank": None,
 }.items():
@@ -58,17 +67,12 @@ with st.sidebar:
 
     # ✅ No confidence bar UI. Keep a simple threshold control for validation logic.
     # confidence_threshold = st.number_input("Confidence threshold", min_value=0.0, max_value=1.0, value=0.6, step=0.05)
+    confidence_threshold = 0.6
 
     st.divider()
     st.subheader("Upload client documents")
 
-    uploaded_files = st.file_uploader("Upload PDFs", type=["pdf"], accept_multiple_files=True)
-    
-    if uploaded_files:
-        pdf_bytes = []
-        for f in uploaded_files:
-            pdf_bytes.append((f.name, f.read()))
-        st.session_state.pdf_bytes = pdf_bytes
+    uploads = st.file_uploader("Upload PDFs", type=["pdf"], accept_multiple_files=True) or []
 st.divider()
 
 colA, colB = st.columns([1, 1], gap="large")
@@ -89,16 +93,43 @@ with colA:
             prog.progress(pct)
 
         try:
-            # Store bytes for multimodal Gemini (key change)
-            pdf_bytes = [(f.name, f.getvalue()) for f in uploads]
-            st.session_state.uploaded_pdf_bytes = pdf_bytes
-            st.session_state.doc_names = [n for (n, _) in pdf_bytes]
-
-            # Extract text too (useful when PDFs are not scanned)
-            pdf_text, _names = extract_text_from_uploads(
-                uploads, on_file=on_file, on_progress=on_progress
+            doc_session = st.session_state.doc_session
+
+            # Store bytes for multimodal Gemini in the shared doc store (deduped across sessions)
+            doc_refs = [(f.name, doc_session.put(f.getvalue())) for f in uploads]
+            st.session_state.doc_refs = doc_refs
+            st.session_state.doc_names = [n for (n, _) in doc_refs]
+
+            # Extract text too (useful when PDFs are not scanned). Only files not
+            # read before are parsed; earlier ones reuse their stored text.
+            text_refs = {
+                h: r for h, r in st.session_state.doc_text_refs.items() if h in {d for (_, d) in doc_refs}
+            }
+            to_read = {}
+            for f, (_, h) in zip(uploads, doc_refs):
+                if h not in text_refs:
+                    to_read.setdefault(h, f)
+            for i, (h, f) in enumerate(to_read.items(), start=1):
+                text, _names = extract_text_from_uploads([f], on_file=on_file)
+                text_refs[h] = doc_session.put_text(text or "")
+                on_progress(int(i / len(to_read) * 100))
+            on_progress(100)
+            st.session_state.doc_text_refs = text_refs
+
+            store = get_document_store()
+            seen = set()
+            texts = []
+            for (_, h) in doc_refs:
+                if h not in seen:
+                    seen.add(h)
+                    texts.append(store.get_text(text_refs[h]))
+            pdf_text = "\n\n".join(t for t in texts if t)
+            st.session_state.pdf_text_ref = doc_session.put_text(pdf_text)
+
+            # Drop anything from a previous upload that is no longer referenced
+            doc_session.keep_only(
+                [h for (_, h) in doc_refs] + list(text_refs.values()) + [st.session_state.pdf_text_ref]
             )
-            st.session_state.pdf_text = pdf_text or ""
 
             st.success(f"Loaded {len(st.session_state.doc_names)} file(s).")
         except Exception as e:
@@ -108,9 +139,12 @@ with colA:
         st.caption("Files loaded:")
         st.write(st.session_state.doc_names)
 
-    if st.session_state.pdf_text:
+    preview = ""
+    if st.session_state.pdf_text_ref:
+        preview = get_document_store().get(st.session_state.pdf_text_ref)[:4000].decode("utf-8", "ignore")
+    if preview:
         with st.expander("Preview extracted text (first 4,000 chars)"):
-            st.text(st.session_state.pdf_text[:4000])
+            st.text(preview)
     else:
         st.caption("Text preview is empty (common for scanned PDFs). Extraction will still work using Gemini multimodal.")
 
@@ -121,45 +155,94 @@ with colB:
 
     live = st.empty()
 
-    if st.button("Extract & Validate", disabled=not (selected_banks and st.session_state.uploaded_pdf_bytes)):
+    def show_live(_bank_name, partial):
+        # Show live table (no confidence bar)
+        rows = []
+        for field, v in partial.items():
+            rows.append(
+                {
+                    "field": field,
+                    "value": v.get("value"),
+                    "missing": v.get("flags", {}).get("missing"),
+                    "invalid_format": v.get("flags", {}).get("invalid_format"),
+                }
+            )
+        df = pd.DataFrame(rows)
+        live.dataframe(df, use_container_width=True, hide_index=True)
+
+    if st.button("Extract & Validate", disabled=not (selected_banks and st.session_state.doc_refs)):
         st.session_state.outputs = {}
+        store = get_document_store()
+        pdf_text = store.get_text(st.session_state.pdf_text_ref) if st.session_state.pdf_text_ref else ""
+        uploaded_pdfs = materialize(st.session_state.doc_refs, store)
 
         for bank in selected_banks:
             st.write(f"### {bank}")
-            bank_partial = {"data": {}}
-
-            def on_partial_update(_bank_name, partial):
-                bank_partial["data"] = partial  # replace with normalized snapshot
-
-                # Show live table (no confidence bar)
-                rows = []
-                for field, v in bank_partial["data"].items():
-                    rows.append(
-                        {
-                            "field": field,
-                            "value": v.get("value"),
-                            "missing": v.get("flags", {}).get("missing"),
-                            "invalid_format": v.get("flags", {}).get("invalid_format"),
-                        }
-                    )
-                df = pd.DataFrame(rows)
-                live.dataframe(df, use_container_width=True, hide_index=True)
 
             try:
                 payload = process_bank(
                     bank_name=bank,
-                    pdf_text=st.session_state.pdf_text,
-                    uploaded_pdfs=st.session_state.uploaded_pdf_bytes,
+                    pdf_text=pdf_text,
+                    uploaded_pdfs=uploaded_pdfs,
                     confidence_threshold=float(confidence_threshold),
-                    on_partial_update=on_partial_update,
+                    on_partial_update=show_live,
                 )
             except Exception as e:
                 payload = {"bank": bank, "fields": {}, "missing_fields": [], "error": str(e)}
 
             st.session_state.outputs[bank] = payload
 
+        st.session_state.extracted_refs = [h for (_, h) in st.session_state.doc_refs]
         st.success("Extraction complete. Go to the chat below to fill missing fields.")
 
+    # Documents uploaded after the last extraction (e.g. a missing salary certificate)
+    new_refs = []
+    for (n, h) in st.session_state.doc_refs:
+        if h not in set(st.session_state.extracted_refs) and h not in {d for (_, d) in new_refs}:
+            new_refs.append((n, h))
+    if st.session_state.outputs and new_refs:
+        st.caption(f"{len(new_refs)} new document(s) since last extraction: {', '.join(n for n, _ in new_refs)}")
+
+    if st.button(
+        "Update with new documents",
+        disabled=not (st.session_state.outputs and new_refs),
+        help="Re-asks only missing / low-confidence fields against the new documents. Manual answers are kept.",
+    ):
+        store = get_document_store()
+        # text was already extracted (and stored per document) by "Read uploaded PDFs"
+        text_refs = st.session_state.doc_text_refs
+        new_hashes = {h for (_, h) in new_refs}
+        earlier_refs = [(n, h) for (n, h) in st.session_state.doc_refs if h not in new_hashes]
+
+        def joined_text(refs):
+            return "\n\n".join(t for t in (store.get_text(text_refs[h]) for (_, h) in refs if h in text_refs) if t)
+
+        new_text = joined_text(new_refs)
+        context_text = joined_text(earlier_refs)
+        new_pdfs = materialize(new_refs, store)
+        earlier_pdfs = materialize(earlier_refs, store)
+
+        for bank, previous in list(st.session_state.outputs.items()):
+            st.write(f"### {bank}")
+            try:
+                payload = process_bank_incremental(
+                    bank_name=bank,
+                    previous=previous,
+                    new_pdf_text=new_text,
+                    new_uploaded_pdfs=new_pdfs,
+                    context_text=context_text,
+                    earlier_uploaded_pdfs=earlier_pdfs,
+                    confidence_threshold=float(confidence_threshold),
+                    on_partial_update=show_live,
+                )
+            except Exception as e:
+                payload = dict(previous, error=str(e))
+
+            st.session_state.outputs[bank] = payload
+
+        st.session_state.extracted_refs = [h for (_, h) in st.session_state.doc_refs]
+        st.success("Update complete.")
+
 
 # ---- 3) Advisor chat ----
 st.divider()
@@ -182,6 +265,9 @@ else:
         if payload.get("error"):
             st.error(payload["error"])
         st.write(missing[:60] if missing else ["✅ None"])
+        if payload.get("tier_stats"):
+            with st.expander("Model usage"):
+                st.json(payload["tier_stats"])
 
     with left:
         for msg in st.session_state.chat:
@@ -233,7 +319,7 @@ else:
                         "value": v,
                         "confidence": 0.99,
                         "evidence": "manual_input",
-                        "flags": {"missing": False, "low_confidence": False, "invalid_format": False},
+                        "flags": {"missing": False, "low_confidence": False, "invalid_format": False, "ungrounded": False},
                     }
                     payload["missing_fields"] = [x for x in missing if x != f]
                     st.session_state.outputs[bank] = payload
@@ -250,7 +336,7 @@ else:
                     "value": text,
                     "confidence": 0.99,
                     "evidence": "manual_input",
-                    "flags": {"missing": False, "low_confidence": False, "invalid_format": False},
+                    "flags": {"missing": False, "low_confidence": False, "invalid_format": False, "ungrounded": False},
                 }
                 payload["missing_fields"] = missing[1:]
                 st.session_state.outputs[bank] = payload
@@ -285,6 +371,9 @@ if st.session_state.outputs:
                     "value": v.get("value"),
                     "confidence": v.get("confidence"),
                     "evidence": v.get("evidence"),
+                    "source_file": (v.get("source") or {}).get("file"),
+                    "source_page": (v.get("source") or {}).get("page"),
+                    "ungrounded": v.get("flags", {}).get("ungrounded"),
                     "missing": v.get("flags", {}).get("missing"),
                     "low_confidence": v.get("flags", {}).get("low_confidence"),
                     "invalid_format": v.get("flags", {}).get("invalid_format"),
@@ -1,13 +1,23 @@
 from __future__ import annotations
+import threading
 from pathlib import Path
 import pandas as pd
 
 REGISTRY_PATH = Path("backend/registry_store/bank_registry.csv")
 
+# (mtime, frame) of the last load; the CSV is re-read only when it changes.
+_CACHE: dict = {}
+_CACHE_LOCK = threading.Lock()
+
 def load_bank_registry() -> pd.DataFrame:
     if not REGISTRY_PATH.exists():
         raise FileNotFoundError(f"{REGISTRY_PATH} not found. Run: python backend/build_bank_registry.py")
 
+    mtime = REGISTRY_PATH.stat().st_mtime
+    with _CACHE_LOCK:
+        if _CACHE.get("mtime") == mtime:
+            return _CACHE["df"]
+
     df = pd.read_csv(REGISTRY_PATH)
 
     # Normalize required
@@ -27,6 +37,9 @@ def load_bank_registry() -> pd.DataFrame:
     df["bank_label"] = df["bank_label"].fillna("").astype(str).str.strip()
     df["canonical_key"] = df["canonical_key"].fillna("").astype(str).str.strip()
 
+    with _CACHE_LOCK:
+        _CACHE["mtime"] = mtime
+        _CACHE["df"] = df
     return df
 
 def required_fields_for_bank(bank: str) -> list[str]:
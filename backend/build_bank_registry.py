@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import math
 import re
+import time
+import unicodedata
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 import pandas as pd
 from pypdf import PdfReader
 
@@ -12,6 +16,327 @@ OUT_DIR.mkdir(parents=True, exist_ok=True)
 MAPPING_SEED = Path("config/mappings/field_mapping_seed.csv")
 
 
+_BLACKLIST = [
+    "signature", "for bank use", "office use", "page", "stamp", "branch",
+    "terms and conditions", "declaration", "please tick", "notes"
+]
+
+# Auto-generated widget names carry no meaning (e.g. "Text Field 12", "Check Box3",
+# "Text2000", "Other2", "7"), nor do bare date-part names ("DD10", "MM11-2", "YYYY")
+_GENERIC_NAME = re.compile(
+    r"^(text\s*field|text|check\s*box|radio\s*button|field|button|untitled|other|dd|mm|yy|yyyy)?[\s_\-.\d]*$",
+    re.I,
+)
+
+# Date entered in separate boxes: "DOB-DD" / "DOB-MM" / "DOB-YYYY", "DD11-2", ...
+_DATE_PART = re.compile(r"^(?P<base>.*?)(?:^|[\s_\-.]+)(?:dd|mm|yy|yyyy)(?P<tail>[\s_\-.\d]*)$", re.I)
+
+# One checkbox per option, named "<question>-<option>" (e.g. "AccessibilitySuppot-Yes")
+_OPTION_NAME = re.compile(r"^(?P<base>.+?)\s*[-_]\s*(?P<option>[^-_]+)$")
+
+# Arabic script blocks and the replacement char left by unmapped glyphs
+_NON_LATIN = re.compile(r"[\u0600-\u06FF\u0750-\u077F\uFB50-\uFDFF\uFE70-\uFEFF\uFFFD]+")
+
+_FIELD_TYPES = {"/Tx": "text", "/Ch": "choice", "/Sig": "signature"}
+
+
+def _inherited(annot: Any, key: str) -> Any:
+    """Field attributes (/T, /FT, /TU, /Ff) may sit on the widget or any parent."""
+    node = annot
+    while node is not None:
+        if key in node:
+            return node[key]
+        parent = node.get("/Parent")
+        node = parent.get_object() if parent is not None else None
+    return None
+
+
+def _qualified_name(annot: Any) -> str:
+    parts = []
+    node = annot
+    while node is not None:
+        if "/T" in node:
+            parts.append(str(node["/T"]))
+        parent = node.get("/Parent")
+        node = parent.get_object() if parent is not None else None
+    return ".".join(reversed(parts))
+
+
+def _field_type(annot: Any) -> str:
+    ft = _inherited(annot, "/FT")
+    if ft == "/Btn":
+        flags = int(_inherited(annot, "/Ff") or 0)
+        if flags & (1 << 16):
+            return "pushbutton"
+        return "radio" if flags & (1 << 15) else "checkbox"
+    return _FIELD_TYPES.get(str(ft), "unknown")
+
+
+def _button_states(annot: Any) -> List[str]:
+    """On-state names of a checkbox / radio widget (its /AP /N keys except /Off)."""
+    ap = annot.get("/AP")
+    normal = ap.get_object().get("/N") if ap is not None else None
+    if normal is None or not hasattr(normal.get_object(), "keys"):
+        return []
+    return [str(k).lstrip("/").strip() for k in normal.get_object().keys() if str(k) != "/Off"]
+
+
+def _humanize(name: str) -> str:
+    """Passport-Number / EIDNumberPrimary / First_Name -> spaced words."""
+    name = re.sub(r"(?<=[a-z])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])", " ", name)
+    return " ".join(re.sub(r"[_\-]+", " ", name).split())
+
+
+def _usable(label: str) -> bool:
+    return len(label) >= 3 and not _GENERIC_NAME.match(label) and label.lower() != "undefined"
+
+
+def _widget_label(tooltip: Any, name: str, ftype: str) -> str:
+    """
+    Tooltip (/TU) if it says something, else the humanized field name (for a
+    date-part box, the name without its DD/MM/YYYY suffix). "" if neither does.
+    """
+    label = _humanize(str(tooltip)) if tooltip else ""
+    if _usable(label):
+        return label
+    short = name.split(".")[-1]
+    m = _DATE_PART.match(short) if ftype == "text" else None
+    label = _humanize(m.group("base") if m else short)
+    return label if _usable(label) else ""
+
+
+def _merge_into(first: Dict[str, Any], f: Dict[str, Any]) -> None:
+    first["field_name"] += "|" + f["field_name"]
+    first["label"] = first["label"] or f["label"]
+    if first["rect"] and f["rect"]:
+        a, b = first["rect"], f["rect"]
+        first["rect"] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+
+
+def _group_date_parts(fields: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge the DD / MM / YYYY boxes of one date into a single "date" field."""
+    groups: Dict[tuple, Dict[str, Any]] = {}
+    out: List[Dict[str, Any]] = []
+    for f in fields:
+        m = _DATE_PART.match(f["field_name"].split(".")[-1]) if f["field_type"] == "text" else None
+        if m is None:
+            out.append(f)
+            continue
+        key = (f["page"], m.group("base").lower(), m.group("tail").strip(" _-."))
+        first = groups.get(key)
+        if first is None:
+            groups[key] = f
+            out.append(f)
+            continue
+        first["field_type"] = "date"
+        _merge_into(first, f)
+    return out
+
+
+def _text_runs(page: Any) -> List[Tuple[float, float, float, str]]:
+    """
+    (x0, x1, y, text) for each run of Latin text on the page, with adjacent
+    fragments of one line joined. x1 is estimated from the font size. The
+    forms are bilingual; Arabic text is dropped so labels stay in English.
+    """
+    frags: List[List[Any]] = []
+
+    def visit(text: str, cm: Any, tm: Any, _font: Any, font_size: float) -> None:
+        t = " ".join(_NON_LATIN.sub(" ", unicodedata.normalize("NFKC", text or "")).split())
+        if not t:
+            return
+        x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        size = font_size * math.hypot(cm[0], cm[1]) * math.hypot(tm[0], tm[1]) or font_size
+        frags.append([x, x + 0.5 * size * len(t), y, t, size])
+
+    page.extract_text(visitor_text=visit)
+    frags.sort(key=lambda fr: (-round(fr[2]), fr[0]))
+    runs: List[List[Any]] = []
+    for fr in frags:
+        last = runs[-1] if runs else None
+        if last and abs(last[2] - fr[2]) < 1 and fr[0] - last[1] < 1.5 * fr[4]:
+            last[1] = max(last[1], fr[1])
+            last[3] += " " + fr[3]
+        else:
+            runs.append(fr)
+    return [(r[0], r[1], r[2], r[3]) for r in runs if re.search(r"[A-Za-z]{2}", r[3])]
+
+
+def _label_from_layout(page: Any, page_fields: List[Dict[str, Any]], unlabelled: List[Dict[str, Any]]) -> None:
+    """
+    Label widgets that have no usable tooltip / name from the page text: the
+    nearest run on the same line to the left, else the nearest one just above.
+    A box directly right of an already-labelled box (e.g. the MM box after
+    DD) shares its label. Sets "label", "source" = "layout" and "_anchor".
+    """
+    runs = _text_runs(page)
+    todo = {id(f) for f in unlabelled}
+    anchors: Dict[int, int] = {}
+    for f in sorted(page_fields, key=lambda f: f["rect"][0]):
+        if id(f) not in todo:
+            continue
+        x0, y0, x1, y1 = f["rect"]
+        best: Optional[Tuple[float, int]] = None
+        for i, (rx0, rx1, ry, _t) in enumerate(runs):
+            if y0 - 2 <= ry <= y1 + 2 and rx0 < x0:
+                d = max(0.0, x0 - rx1)
+                if best is None or d < best[0]:
+                    best = (d, i)
+
+        # another box between that text and this one?
+        between = [
+            g for g in page_fields
+            if g is not f and g["rect"][2] <= x0 + 1 and g["rect"][1] < y1 and g["rect"][3] > y0
+            and (best is None or g["rect"][0] > runs[best[1]][0])
+        ]
+        anchor = best[1] if best else None
+        if between:
+            g = max(between, key=lambda g: g["rect"][2])
+            anchor = anchors.get(id(g)) if x0 - g["rect"][2] < 20 else None
+        if anchor is None:
+            above = [
+                (ry - y1, i) for i, (rx0, rx1, ry, _t) in enumerate(runs)
+                if y1 < ry <= y1 + 18 and rx0 < x1 and rx1 > x0 - 5
+            ]
+            anchor = min(above)[1] if above else None
+        if anchor is None:
+            continue
+
+        label = runs[anchor][3].split(":")[0].strip(" .*")
+        if not _usable(label):
+            continue
+        anchors[id(f)] = anchor
+        f["label"] = label
+        f["source"] = "layout"
+        f["_anchor"] = (f["page"], anchor)
+        # text at the start of the same line, to tell repeated labels apart
+        rx0, _rx1, ry, _t = runs[anchor]
+        row = [r for r in runs if abs(r[2] - ry) < 1 and r[1] < rx0]
+        f["_row"] = min(row)[3].split(":")[0].strip(" .*") if row else ""
+
+
+def _merge_anchored(fields: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One field per layout label; repeated label texts get their row's label prefixed."""
+    groups: Dict[tuple, Dict[str, Any]] = {}
+    out: List[Dict[str, Any]] = []
+    for f in fields:
+        key = f.get("_anchor")
+        if key in groups:
+            _merge_into(groups[key], f)
+            continue
+        if key is not None:
+            groups[key] = f
+        out.append(f)
+
+    counts: Dict[str, int] = {}
+    for f in groups.values():
+        counts[f["label"]] = counts.get(f["label"], 0) + 1
+    for f in groups.values():
+        if counts[f["label"]] > 1 and f["_row"] and f["_row"] != f["label"]:
+            f["label"] = f"{f['_row']} - {f['label']}"
+    return out
+
+
+def _group_options(fields: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge per-option checkboxes ("Q-Yes", "Q-No") into one field with those
+    options. A checkbox left with fewer than two options is a lone tick box
+    and is not required.
+    """
+    def key(f: Dict[str, Any]) -> Optional[tuple]:
+        m = _OPTION_NAME.match(f["field_name"]) if f["field_type"] == "checkbox" else None
+        return (f["page"], m.group("base")) if m else None
+
+    counts: Dict[tuple, int] = {}
+    for f in fields:
+        k = key(f)
+        if k:
+            counts[k] = counts.get(k, 0) + 1
+
+    groups: Dict[tuple, Dict[str, Any]] = {}
+    out: List[Dict[str, Any]] = []
+    for f in fields:
+        k = key(f)
+        if k and counts[k] > 1:
+            option = _humanize(_OPTION_NAME.match(f["field_name"]).group("option"))
+            first = groups.get(k)
+            if first is not None:
+                first["field_name"] += "|" + f["field_name"]
+                first["options"].append(option)
+                continue
+            f["label"] = _widget_label(None, k[1], "checkbox") or f["label"]
+            f["options"] = [option]
+            groups[k] = f
+        out.append(f)
+
+    for f in out:
+        f["required"] = not (f["field_type"] == "checkbox" and len(f["options"]) < 2)
+    return out
+
+
+def _acroform_fields(reader: PdfReader) -> Optional[List[Dict[str, Any]]]:
+    """
+    Read form fields straight from the widget annotations, without any text
+    layout extraction. Returns None for flat PDFs (no AcroForm widgets).
+    Label = tooltip (/TU) if meaningful, else the humanized field name, else
+    (text / choice widgets) the nearest text on the page. The boxes of a
+    split date become one field, as do per-option checkboxes; widgets left
+    without a label are skipped.
+    """
+    if "/AcroForm" not in reader.trailer["/Root"]:
+        return None
+
+    fields: List[Dict[str, Any]] = []
+    by_name: Dict[str, Dict[str, Any]] = {}
+    widgets = 0
+    for page_no, page in enumerate(reader.pages, start=1):
+        for ref in page.get("/Annots") or []:
+            annot = ref.get_object()
+            if annot.get("/Subtype") != "/Widget":
+                continue
+            widgets += 1
+            name = _qualified_name(annot)
+            if not name:
+                continue
+            ftype = _field_type(annot)
+            if ftype in ("pushbutton", "signature"):
+                continue
+            states = _button_states(annot) if ftype in ("checkbox", "radio") else []
+            if name in by_name:
+                # another widget (option) of a field we already have
+                opts = by_name[name]["options"]
+                opts.extend(o for o in states if o not in opts)
+                continue
+
+            rect = [round(float(x), 1) for x in (annot.get("/Rect") or [])]
+            by_name[name] = {
+                "label": _widget_label(_inherited(annot, "/TU"), name, ftype),
+                "field_name": name,
+                "field_type": ftype,
+                "page": page_no,
+                "rect": rect,
+                "options": list(dict.fromkeys(states)),
+                "source": "acroform",
+            }
+            fields.append(by_name[name])
+
+    if not widgets:
+        return None
+
+    fields = _group_date_parts(fields)
+    # Only pages with unlabelled text boxes pay for a text layout pass.
+    unlabelled = [f for f in fields if not f["label"] and f["rect"] and f["field_type"] in ("text", "choice", "date")]
+    for page_no in sorted({f["page"] for f in unlabelled}):
+        _label_from_layout(
+            reader.pages[page_no - 1],
+            [f for f in fields if f["page"] == page_no and f["rect"]],
+            [f for f in unlabelled if f["page"] == page_no],
+        )
+    fields = _merge_anchored(fields)
+    return [f for f in _group_options(fields) if f["label"]]
+
+
 def _pdf_to_text(path: Path) -> str:
     reader = PdfReader(str(path))
     parts = []
@@ -38,16 +363,11 @@ def _guess_labels(text: str) -> list[str]:
             if 3 <= len(left) <= 90:
                 labels.add(left)
 
-    blacklist = [
-        "signature", "for bank use", "office use", "page", "stamp", "branch",
-        "terms and conditions", "declaration", "please tick", "notes"
-    ]
-    out = []
-    for l in labels:
-        if any(b in l.lower() for b in blacklist):
-            continue
-        out.append(l)
-    return sorted(out)
+    return sorted(l for l in labels if not _blacklisted(l))
+
+
+def _blacklisted(label: str) -> bool:
+    return any(b in label.lower() for b in _BLACKLIST)
 
 
 def _load_mapping_seed() -> list[tuple[str, str]]:
@@ -77,24 +397,82 @@ def main() -> None:
 
     mapping = _load_mapping_seed()
     rows = []
+    timings = []
     for pdf in sorted(BANK_FORMS_DIR.glob("*.pdf")):
         bank = pdf.stem.replace("_Mortgage_App", "").replace("_", " ").strip()
-        text = _pdf_to_text(pdf)
-        for label in _guess_labels(text):
+        t0 = time.perf_counter()
+
+        # AcroForm first: exact field names/types/positions; a text layout pass
+        # only for pages with boxes that carry no usable name
+        fields = _acroform_fields(PdfReader(str(pdf)))
+        # "mixed": some labels came from the page text next to the widget
+        source = "mixed" if any(f["source"] == "layout" for f in fields or []) else "acroform"
+        if not fields:
+            # flat PDF (or only auto-named widgets): fall back to text heuristics
+            source = "text"
+            fields = [
+                {
+                    "label": label, "field_name": "", "field_type": "", "page": "", "rect": "",
+                    "options": [], "required": True, "source": source,
+                }
+                for label in _guess_labels(_pdf_to_text(pdf))
+            ]
+
+        # One registry row per label (extraction asks per label). Distinct
+        # widgets that humanize to the same label are collapsed into the first
+        # one and reported so they can be relabelled by hand.
+        kept: Dict[str, str] = {}
+        collapsed: List[str] = []
+        for f in fields:
+            if _blacklisted(f["label"]):
+                continue
+            if f["label"] in kept:
+                if f["field_name"]:
+                    collapsed.append(f"{f['field_name']} -> {kept[f['label']]}")
+                continue
+            kept[f["label"]] = f["field_name"] or f["label"]
             rows.append(
                 {
                     "bank": bank,
-                    "bank_label": label,
-                    "canonical_key": _map_label(label, mapping),
-                    "required": True,
+                    "bank_label": f["label"],
+                    "canonical_key": _map_label(f["label"], mapping),
+                    "required": f["required"],
                     "section": "",
+                    "source": f["source"],
+                    "field_name": f["field_name"],
+                    "field_type": f["field_type"],
+                    "page": f["page"],
+                    "rect": " ".join(str(x) for x in f["rect"]) if f["rect"] else "",
+                    "options": "|".join(f["options"]),
                 }
             )
 
-    df = pd.DataFrame(rows).drop_duplicates()
+        n = len(kept)
+        seconds = time.perf_counter() - t0
+        timings.append(
+            {
+                "bank": bank,
+                "file": pdf.name,
+                "source": source,
+                "fields": n,
+                "collapsed": len(collapsed),
+                "seconds": round(seconds, 3),
+            }
+        )
+        print(f"{bank}: {n} fields via {source} in {seconds:.2f}s")
+        if collapsed:
+            print(f"  {len(collapsed)} widget(s) share a label with an earlier field and were collapsed:")
+            for c in collapsed:
+                print(f"    {c}")
+
+    df = pd.DataFrame(rows)
     out_csv = OUT_DIR / "bank_registry.csv"
     df.to_csv(out_csv, index=False)
     print(f"Saved registry -> {out_csv} ({len(df)} rows)")
+
+    timings_csv = OUT_DIR / "build_timings.csv"
+    pd.DataFrame(timings).to_csv(timings_csv, index=False)
+    print(f"Saved build timings -> {timings_csv}")
     print("Tip: fill 'canonical_key' for unmapped labels, and set required=False for optional fields.")
 
 
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Set, Tuple
+
+
+def _default_budget() -> int:
+    return int(float(os.getenv("DOC_STORE_MAX_MEMORY_MB", "512")) * 1024 * 1024)
+
+
+class _Entry:
+    __slots__ = ("size", "data", "path", "sessions")
+
+    def __init__(self, data: bytes):
+        self.size = len(data)
+        self.data: Optional[bytes] = data
+        self.path: Optional[Path] = None
+        self.sessions: Set[str] = set()
+
+
+class DocumentStore:
+    """
+    Process-wide, content-addressed store for uploaded documents.
+
+    - Keys are sha256 hex digests, so identical files uploaded by different
+      sessions are stored once.
+    - Resident bytes are kept under a global memory budget; least recently
+      used entries are spilled to disk and read back through mmap.
+    - Each entry is reference-counted by session id and deleted when the last
+      session holding it is released.
+    """
+
+    def __init__(self, memory_budget: Optional[int] = None, spill_dir: Optional[str] = None):
+        self.memory_budget = _default_budget() if memory_budget is None else int(memory_budget)
+        self._spill_dir = Path(spill_dir or os.getenv("DOC_STORE_SPILL_DIR") or tempfile.mkdtemp(prefix="doc_store_"))
+        self._spill_dir.mkdir(parents=True, exist_ok=True)
+        self._entries: Dict[str, _Entry] = {}
+        self._resident: "OrderedDict[str, None]" = OrderedDict()  # LRU order, oldest first
+        self._resident_bytes = 0
+        self._lock = threading.RLock()
+
+    # ---- write side ----
+    def put(self, data: bytes, session_id: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                entry = _Entry(bytes(data))
+                self._entries[digest] = entry
+                self._resident[digest] = None
+                self._resident_bytes += entry.size
+            elif digest in self._resident:
+                self._resident.move_to_end(digest)
+            entry.sessions.add(session_id)
+            self._enforce_budget()
+        return digest
+
+    def put_text(self, text: str, session_id: str) -> str:
+        return self.put((text or "").encode("utf-8"), session_id)
+
+    # ---- read side ----
+    def get(self, digest: str) -> bytes:
+        with self._lock:
+            entry = self._entries[digest]
+            if entry.data is not None:
+                self._resident.move_to_end(digest)
+                return entry.data
+            path = entry.path
+        if not path or entry.size == 0:
+            return b""
+        with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[:]
+
+    def get_text(self, digest: str) -> str:
+        return self.get(digest).decode("utf-8")
+
+    def open(self, digest: str) -> BinaryIO:
+        """
+        Seekable read-only stream over a document (e.g. for PdfReader).
+        Spilled entries are mapped from disk instead of copied into memory.
+        """
+        with self._lock:
+            entry = self._entries[digest]
+            if entry.data is not None:
+                self._resident.move_to_end(digest)
+                return io.BytesIO(entry.data)
+            path = entry.path
+        if not path or entry.size == 0:
+            return io.BytesIO(b"")
+        with open(path, "rb") as fh:
+            return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)  # type: ignore[return-value]
+
+    def __contains__(self, digest: str) -> bool:
+        with self._lock:
+            return digest in self._entries
+
+    # ---- lifecycle ----
+    def release(self, digest: str, session_id: str) -> None:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return
+            entry.sessions.discard(session_id)
+            if not entry.sessions:
+                self._drop(digest)
+
+    def release_session(self, session_id: str) -> None:
+        with self._lock:
+            for digest in [d for d, e in self._entries.items() if session_id in e.sessions]:
+                self.release(digest, session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions: Set[str] = set()
+            for e in self._entries.values():
+                sessions |= e.sessions
+            return {
+                "documents": len(self._entries),
+                "sessions": len(sessions),
+                "total_bytes": sum(e.size for e in self._entries.values()),
+                "resident_bytes": self._resident_bytes,
+                "spilled_documents": sum(1 for e in self._entries.values() if e.data is None),
+                "memory_budget": self.memory_budget,
+            }
+
+    # ---- internals ----
+    def _drop(self, digest: str) -> None:
+        entry = self._entries.pop(digest)
+        if digest in self._resident:
+            del self._resident[digest]
+            self._resident_bytes -= entry.size
+        if entry.path is not None:
+            try:
+                entry.path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _enforce_budget(self) -> None:
+        while self._resident_bytes > self.memory_budget and self._resident:
+            digest, _ = self._resident.popitem(last=False)
+            entry = self._entries[digest]
+            path = self._spill_dir / digest
+            tmp = path.with_suffix(".part")
+            with open(tmp, "wb") as fh:
+                fh.write(entry.data or b"")
+            os.replace(tmp, path)
+            entry.path = path
+            entry.data = None
+            self._resident_bytes -= entry.size
+
+
+class DocSession:
+    """
+    Per-session handle onto the shared store. Holds only digests; everything
+    it references is released when the handle is garbage collected (i.e. when
+    Streamlit drops the session state) or when close() is called.
+    """
+
+    def __init__(self, store: DocumentStore, session_id: Optional[str] = None):
+        self.store = store
+        self.id = session_id or uuid.uuid4().hex
+        self._finalizer = weakref.finalize(self, store.release_session, self.id)
+
+    def put(self, data: bytes) -> str:
+        return self.store.put(data, self.id)
+
+    def put_text(self, text: str) -> str:
+        return self.store.put_text(text, self.id)
+
+    def keep_only(self, digests: Iterable[str]) -> None:
+        """Release every digest this session holds that is not in `digests`."""
+        keep = set(digests)
+        with self.store._lock:
+            held = [d for d, e in self.store._entries.items() if self.id in e.sessions]
+        for d in held:
+            if d not in keep:
+                self.store.release(d, self.id)
+
+    def close(self) -> None:
+        self._finalizer()
+
+
+_STORE: Optional[DocumentStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_document_store() -> DocumentStore:
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = DocumentStore()
+        return _STORE
+
+
+def open_session(session_id: Optional[str] = None) -> DocSession:
+    return DocSession(get_document_store(), session_id)
+
+
+def materialize(
+    refs: List[Tuple[str, str]], store: Optional[DocumentStore] = None
+) -> List[Tuple[str, bytes]]:
+    """[(name, digest), ...] -> [(name, bytes), ...] for the LLM call."""
+    store = store or get_document_store()
+    return [(name, store.get(digest)) for name, digest in refs]
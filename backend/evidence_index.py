@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import re
+import threading
+from array import array
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+_FILE_HEADER = re.compile(r"^### FILE: (.+)$", flags=re.M)
+# Same notion of a word character as _normalize (str.isalnum, any script)
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _normalize(text: str) -> Tuple[str, array]:
+    """
+    Lowercase and collapse every run of non-alphanumerics to one space, so
+    evidence still matches across line breaks, punctuation and spacing noise.
+    Returns the normalized text and, per normalized char, its offset in `text`.
+    """
+    out: List[str] = []
+    offsets = array("l")
+    pending_space = False
+    for i, ch in enumerate(text):
+        c = ch.lower()
+        if c.isalnum():
+            if pending_space and out:
+                out.append(" ")
+                offsets.append(i)
+            pending_space = False
+            out.append(c)
+            offsets.append(i)
+        else:
+            pending_space = True
+    return "".join(out), offsets
+
+
+class EvidenceIndex:
+    """
+    Search index over extracted document text (the output of
+    extract_text_from_uploads) used to check that evidence snippets returned
+    by the model actually occur in the documents.
+
+    - Exact match: whole-word substring search over the normalized text
+      (the "### FILE:" header lines are not indexed).
+    - Fuzzy match: word-position index; windows around the rarest snippet
+      word are scored by the fraction of snippet words they contain.
+    - Locations: file from the "### FILE:" headers, page from the form feeds
+      between pages.
+    """
+
+    max_candidates = 200
+
+    def __init__(self, text: str, fuzzy_threshold: float = 0.8):
+        self.fuzzy_threshold = fuzzy_threshold
+        # blank out the headers in place so offsets still line up with `text`
+        masked = _FILE_HEADER.sub(lambda m: " " * len(m.group(0)), text or "")
+        self._norm, self._offsets = _normalize(masked)
+
+        self._words: List[str] = []
+        self._word_starts = array("l")
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for m in _WORD.finditer(self._norm):
+            self._postings[m.group(0)].append(len(self._words))
+            self._words.append(m.group(0))
+            self._word_starts.append(m.start())
+
+        # file / page boundaries as offsets into the original text
+        self._files: List[Tuple[int, str]] = [
+            (m.end(), m.group(1).strip()) for m in _FILE_HEADER.finditer(text or "")
+        ]
+        self._file_starts = [s for s, _ in self._files]
+        self._page_breaks = [m.start() for m in re.finditer("\f", text or "")]
+
+        # Scanned PDFs have no text layer, so their evidence cannot be checked.
+        self.complete = bool(self._norm)
+        for i, (start, _) in enumerate(self._files):
+            end = self._files[i + 1][0] if i + 1 < len(self._files) else len(text or "")
+            if not (text or "")[start:end].strip():
+                self.complete = False
+
+    def __bool__(self) -> bool:
+        return bool(self._norm)
+
+    def _location(self, norm_pos: int) -> Dict[str, Any]:
+        orig = self._offsets[norm_pos] if self._offsets else 0
+        loc: Dict[str, Any] = {"file": None, "page": None}
+        i = bisect.bisect_right(self._file_starts, orig) - 1
+        if i >= 0:
+            start, name = self._files[i]
+            loc["file"] = name
+            loc["page"] = (
+                bisect.bisect_right(self._page_breaks, orig) - bisect.bisect_right(self._page_breaks, start) + 1
+            )
+        elif not self._files:
+            loc["page"] = bisect.bisect_right(self._page_breaks, orig) + 1
+        return loc
+
+    def locate(self, snippet: Any) -> Optional[Dict[str, Any]]:
+        """
+        Find `snippet` in the documents. Returns {"file", "page", "score",
+        "match"} where match is "exact" or "fuzzy", or None if not grounded.
+        """
+        if snippet is None:
+            return None
+        needle, _ = _normalize(str(snippet))
+        if not needle or not self._norm:
+            return None
+
+        # padded on both sides so "5" does not match inside "150"
+        pos = f" {self._norm} ".find(f" {needle} ")
+        if pos != -1:
+            return {**self._location(pos), "score": 1.0, "match": "exact"}
+
+        words = _WORD.findall(needle)
+        present = [(i, w) for i, w in enumerate(words) if w in self._postings]
+        if not words or len(present) / len(words) < self.fuzzy_threshold:
+            return None
+
+        # Anchor on the rarest snippet word, then score a window around each
+        # occurrence by how many snippet words it contains.
+        anchor_i, anchor_w = min(present, key=lambda iw: len(self._postings[iw[1]]))
+        want = Counter(words)
+        slack = max(2, len(words) // 4)
+        best_pos, best_hits = -1, 0
+        for p in self._postings[anchor_w][: self.max_candidates]:
+            start = max(0, p - anchor_i - slack)
+            window = Counter(self._words[start : p - anchor_i + len(words) + slack])
+            hits = sum(min(n, window[w]) for w, n in want.items())
+            if hits > best_hits:
+                best_pos, best_hits = max(0, p - anchor_i), hits
+        score = best_hits / len(words)
+        if score < self.fuzzy_threshold:
+            return None
+        return {**self._location(self._word_starts[best_pos]), "score": round(score, 3), "match": "fuzzy"}
+
+
+_CACHE: "OrderedDict[str, Future]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+_CACHE_SIZE = 8
+
+
+def get_evidence_index(text: str) -> EvidenceIndex:
+    """
+    Build (once per distinct document set) or reuse the index for `text`.
+    Concurrent callers for the same text wait for the first build.
+    """
+    key = hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+    with _CACHE_LOCK:
+        fut = _CACHE.get(key)
+        owner = fut is None
+        if owner:
+            fut = _CACHE[key] = Future()
+            while len(_CACHE) > _CACHE_SIZE:
+                _CACHE.popitem(last=False)
+        else:
+            _CACHE.move_to_end(key)
+
+    if owner:
+        try:
+            fut.set_result(EvidenceIndex(text))
+        except BaseException as e:
+            with _CACHE_LOCK:
+                if _CACHE.get(key) is fut:
+                    del _CACHE[key]
+            fut.set_exception(e)
+            raise
+    return fut.result()
@@ -3,6 +3,8 @@ from __future__ import annotations
 import json
 import os
 import re
+import threading
+import time
 from typing import Any, Dict, List, Tuple, Optional
 
 from google import genai
@@ -38,6 +40,41 @@ def _extract_json_object(text: str) -> str:
     return ""
 
 
+# USD per 1M tokens (input, output). Used only for cost estimates in stats.
+MODEL_PRICING_USD_PER_1M: Dict[str, Tuple[float, float]] = {
+    "models/gemini-2.5-pro": (1.25, 10.00),
+    "models/gemini-2.5-flash": (0.30, 2.50),
+    "models/gemini-2.5-flash-lite": (0.10, 0.40),
+}
+
+
+_CLIENTS: Dict[str, Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(api_key: str):
+    """One genai.Client per API key, shared by all sessions / requests in the process."""
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(api_key)
+        if client is None:
+            client = genai.Client(api_key=api_key)
+            _CLIENTS[api_key] = client
+        return client
+
+
+def strong_model() -> str:
+    return os.getenv("GEMINI_MODEL", "models/gemini-2.5-pro")
+
+
+def fast_model() -> str:
+    return os.getenv("GEMINI_FAST_MODEL", "models/gemini-2.5-flash")
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    price_in, price_out = MODEL_PRICING_USD_PER_1M.get(model, (0.0, 0.0))
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+
 def _safe_json_load(text: str) -> Dict[str, Any]:
     raw = _extract_json_object(text) or text.strip()
     return json.loads(raw)
@@ -78,22 +115,85 @@ DOCUMENTS (extracted text may be incomplete for scanned PDFs; use the attached P
 {pdf_text}
 """.strip()
 
+def _norm_label(s: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", s.lower()).split())
+
+
+def _fake_extract(
+    pdf_text: str,
+    field_list: List[str],
+    model: str,
+) -> Dict[str, Any]:
+    """
+    Offline stand-in for Gemini (LLM_BACKEND=fake). Answers from "Label: value"
+    lines in pdf_text. The fast tier only accepts exact label matches; the
+    strong tier also accepts partial matches. Latency is simulated per tier via
+    FAKE_LLM_LATENCY_MS / FAKE_LLM_FAST_LATENCY_MS.
+    """
+    is_fast = model == fast_model() and model != strong_model()
+    latency_ms = float(
+        os.getenv("FAKE_LLM_FAST_LATENCY_MS", "200") if is_fast else os.getenv("FAKE_LLM_LATENCY_MS", "1000")
+    )
+    if latency_ms > 0:
+        time.sleep(latency_ms / 1000)
+
+    lines: List[Tuple[str, str, str]] = []
+    for raw in (pdf_text or "").splitlines():
+        if ":" not in raw:
+            continue
+        label, value = raw.split(":", 1)
+        if value.strip():
+            lines.append((_norm_label(label), value.strip(), raw.strip()))
+
+    out: Dict[str, Any] = {}
+    for field in field_list:
+        # canonical keys look like "applicant.full_name" -> "full name"
+        want = _norm_label(field.split(".")[-1] if "." in field and " " not in field else field)
+        hit = None
+        for label, value, line in lines:
+            if label == want or (not is_fast and want and (want in label or label in want)):
+                hit = (value, line)
+                break
+        if hit:
+            out[field] = {"value": hit[0], "confidence": 0.8 if is_fast else 0.9, "evidence": hit[1]}
+        else:
+            out[field] = {"value": None, "confidence": 0.0, "evidence": None}
+    return out
+
+
 def extract_fields_with_genai(
     pdf_text: str,
     field_list: List[str],
     bank_name: str,
     uploaded_pdfs: List[Tuple[str, bytes]],
     max_output_tokens: int = 2048,
+    model: Optional[str] = None,
+    usage: Optional[Dict[str, Any]] = None,
 ):
+    """
+    `model` defaults to GEMINI_MODEL. If `usage` is given it is filled with
+    model, latency_s, input_tokens and output_tokens for the call.
+    """
+    model = model or strong_model()
+    prompt = _build_prompt(bank_name, field_list, pdf_text)
+    t0 = time.perf_counter()
+
+    if os.getenv("LLM_BACKEND", "gemini").lower() == "fake":
+        result = _fake_extract(pdf_text, field_list, model)
+        if usage is not None:
+            usage.update(
+                model=model,
+                latency_s=time.perf_counter() - t0,
+                input_tokens=len(prompt) // 4,
+                output_tokens=len(json.dumps(result)) // 4,
+            )
+        return result
+
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         raise RuntimeError("Missing GEMINI_API_KEY")
 
-    client = genai.Client(api_key=api_key)
-
-    model = os.getenv("GEMINI_MODEL", "models/gemini-2.5-pro")
-
-    prompt = _build_prompt(bank_name, field_list, pdf_text)
+    client = get_client(api_key)
 
     # Build message parts EXACTLY as Google expects
     parts = [types.Part.from_text(prompt)]
@@ -119,6 +219,15 @@ def extract_fields_with_genai(
 
     output = resp.text
 
+    if usage is not None:
+        meta = getattr(resp, "usage_metadata", None)
+        usage.update(
+            model=model,
+            latency_s=time.perf_counter() - t0,
+            input_tokens=int(getattr(meta, "prompt_token_count", 0) or 0),
+            output_tokens=int(getattr(meta, "candidates_token_count", 0) or 0),
+        )
+
     try:
         return _safe_json_load(output)
     except Exception:
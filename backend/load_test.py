@@ -0,0 +1,454 @@
+"""
+Multi-session load test + memory profile for the extraction pipeline.
+
+Simulates N concurrent advisor sessions in one process (as Streamlit does:
+one thread per session). Each session uploads a bundle of bank forms sampled
+from assets/bank_forms plus generated client documents (salary certificate,
+ID / passport copy, application summary) carrying synthetic "Label: value"
+lines for a share of the selected banks' required fields, and runs the same
+path as the UI:
+
+    doc store -> extract_text_from_uploads -> process_bank (per bank) -> JSON/CSV export
+
+against the fake LLM backend (LLM_BACKEND=fake) with configurable latency.
+
+Reports throughput, end-to-end and per-stage latency percentiles, peak RSS
+and, with --tracemalloc, the top allocation sites per stage (measured on one
+extra serial session so the numbers are not mixed across threads).
+
+Run (after python backend/build_bank_registry.py):
+    python backend/load_test.py --sessions 20 --concurrency 8 --banks ENBD,RAK --llm-latency-ms 500
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import pandas as pd
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from backend.bank_registry import load_bank_registry, required_fields_for_bank
+from backend.doc_store import get_document_store, open_session
+from backend.orchestrator import process_bank
+from backend.pdf_text import extract_text_from_uploads
+
+BANK_FORMS_DIR = ROOT / "assets/bank_forms"
+STAGES = ["upload", "text", "extract", "export"]
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # non-Linux: fall back to the peak so far
+        return _peak_rss_bytes()
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _RssSampler(threading.Thread):
+    """Samples current RSS in the background to catch the peak during the run."""
+
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = _rss_bytes()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, _rss_bytes())
+            time.sleep(self.interval)
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def _load_forms() -> List[Tuple[str, bytes]]:
+    forms = [(p.name, p.read_bytes()) for p in sorted(BANK_FORMS_DIR.glob("*.pdf"))]
+    if not forms:
+        raise FileNotFoundError(f"No PDFs in {BANK_FORMS_DIR}")
+    return forms
+
+
+_FIRST = ["Ahmed", "Fatima", "Omar", "Aisha", "Rahul", "Priya", "John", "Maria", "Yusuf", "Layla"]
+_LAST = ["Al Mansoori", "Khan", "Haddad", "Sharma", "Smith", "Fernandes", "Nasser", "Rahman"]
+_WORDS = ["Dubai", "Abu Dhabi", "Engineer", "Manager", "Villa", "Apartment", "Salaried", "Married", "UAE"]
+
+
+def _fake_value(label: str, person: Dict[str, str], rng: random.Random) -> str:
+    l = label.lower()
+    if "email" in l:
+        return f"{person['first'].lower()}.{person['last'].split()[-1].lower()}@example.com"
+    if any(k in l for k in ("mobile", "phone", "telephone", "contact number", "fax")):
+        return f"+971 5{rng.randint(0, 9)} {rng.randint(100, 999)} {rng.randint(1000, 9999)}"
+    if "emirates" in l or "eid" in l:
+        return f"784-{rng.randint(1960, 2000)}-{rng.randint(1000000, 9999999)}-{rng.randint(0, 9)}"
+    if any(k in l for k in ("date", "dob", "expiry", "issue")):
+        return f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1965, 2030)}"
+    if any(k in l for k in ("salary", "amount", "income", "limit", "expense", "price", "value")):
+        return f"{rng.randint(5, 500) * 1000}"
+    if "name" in l:
+        return f"{person['first']} {person['last']}"
+    return rng.choice(_WORDS)
+
+
+def _text_pdf(title: str, lines: List[str]) -> bytes:
+    """Minimal text-layer PDF (Helvetica, ~55 lines per page)."""
+    writer = PdfWriter()
+    font = writer._add_object(
+        DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Font"),
+                NameObject("/Subtype"): NameObject("/Type1"),
+                NameObject("/BaseFont"): NameObject("/Helvetica"),
+            }
+        )
+    )
+    per_page = 55
+    for start in range(0, max(1, len(lines)), per_page):
+        chunk = [title, ""] + lines[start : start + per_page] if start == 0 else lines[start : start + per_page]
+        ops = ["BT /F1 10 Tf 13 TL 50 800 Td"]
+        for line in chunk:
+            safe = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            ops.append(f"({safe}) Tj T*")
+        ops.append("ET")
+        content = DecodedStreamObject()
+        content.set_data("\n".join(ops).encode("latin-1", "replace"))
+        page = writer.add_blank_page(595, 842)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+        )
+        page[NameObject("/Contents")] = writer._add_object(content)
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+def _client_documents(fields: List[str], fill_ratio: float, rng: random.Random) -> List[Tuple[str, bytes]]:
+    """
+    Synthetic client documents answering roughly `fill_ratio` of `fields`
+    as "Label: value" lines; the rest stay missing, as in a real bundle.
+    """
+    person = {"first": rng.choice(_FIRST), "last": rng.choice(_LAST)}
+    lines = []
+    for f in fields:
+        if rng.random() >= fill_ratio:
+            continue
+        # canonical keys ("applicant.full_name") appear in documents as "Full Name"
+        label = f.split(".")[-1].replace("_", " ").title() if "." in f and " " not in f else f
+        label = label.replace(":", " ")
+        lines.append(f"{label}: {_fake_value(label, person, rng)}")
+    rng.shuffle(lines)
+
+    titles = ["SALARY CERTIFICATE", "EMIRATES ID / PASSPORT COPY", "APPLICATION SUMMARY"]
+    n = len(titles)
+    return [
+        (f"{t.split()[0].lower()}.pdf", _text_pdf(t, lines[i::n]))
+        for i, t in enumerate(titles)
+    ]
+
+
+def _bundle(
+    forms: List[Tuple[str, bytes]],
+    size: int,
+    fields: List[str],
+    fill_ratio: float,
+    rng: random.Random,
+) -> List[Tuple[str, bytes]]:
+    picked = rng.sample(forms, min(size, len(forms)))
+    docs = _client_documents(fields, fill_ratio, rng) + picked
+    return [(f"client_{i}_{name}", data) for i, (name, data) in enumerate(docs, start=1)]
+
+
+def _export(outputs: Dict[str, Any]) -> Tuple[str, str]:
+    """Same shape as the UI's export step."""
+    rows = []
+    for b, pl in outputs.items():
+        for field, v in (pl.get("fields", {}) or {}).items():
+            rows.append(
+                {
+                    "bank": b,
+                    "field": field,
+                    "value": v.get("value"),
+                    "confidence": v.get("confidence"),
+                    "evidence": v.get("evidence"),
+                    "source_file": (v.get("source") or {}).get("file"),
+                    "source_page": (v.get("source") or {}).get("page"),
+                    "ungrounded": v.get("flags", {}).get("ungrounded"),
+                    "missing": v.get("flags", {}).get("missing"),
+                    "low_confidence": v.get("flags", {}).get("low_confidence"),
+                    "invalid_format": v.get("flags", {}).get("invalid_format"),
+                }
+            )
+    return json.dumps(outputs, indent=2), pd.DataFrame(rows).to_csv(index=False)
+
+
+def run_session(
+    bundle: List[Tuple[str, bytes]],
+    banks: List[str],
+    cascade: Optional[bool] = None,
+    snapshots: Optional[Dict[str, Any]] = None,
+) -> Dict[str, float]:
+    """
+    One advisor session end to end. Returns seconds per stage. If `snapshots`
+    is given (tracemalloc running), a snapshot is stored after each stage.
+    """
+    timings: Dict[str, float] = {}
+
+    def mark(stage: str, t0: float) -> float:
+        timings[stage] = time.perf_counter() - t0
+        if snapshots is not None:
+            snapshots[stage] = tracemalloc.take_snapshot()
+        return time.perf_counter()
+
+    t = time.perf_counter()
+    session = open_session()
+    try:
+        refs = [(name, session.put(data)) for name, data in bundle]
+        t = mark("upload", t)
+
+        streams = []
+        for name, h in refs:
+            s = io.BytesIO(session.store.get(h))
+            s.name = name
+            streams.append(s)
+        pdf_text, _names = extract_text_from_uploads(streams)
+        text_ref = session.put_text(pdf_text or "")
+        del streams, pdf_text
+        t = mark("text", t)
+
+        store = session.store
+        uploaded_pdfs = [(name, store.get(h)) for name, h in refs]
+        outputs = {}
+        for bank in banks:
+            outputs[bank] = process_bank(
+                bank_name=bank,
+                pdf_text=store.get_text(text_ref),
+                uploaded_pdfs=uploaded_pdfs,
+                cascade=cascade,
+            )
+        t = mark("extract", t)
+
+        _export(outputs)
+        mark("export", t)
+    finally:
+        session.close()
+    return timings
+
+
+def _pct(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def _hotspots(
+    snapshots: Dict[str, Any], baseline: Any, top: int, depth: int = 1
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Allocation sites whose retained memory grew the most during each stage.
+    With depth > 1, sites are grouped by full call stack (innermost first).
+    """
+    key = "traceback" if depth > 1 else "lineno"
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    prev = baseline.filter_traces(ignore)
+    for stage in STAGES:
+        snap = snapshots.get(stage)
+        if snap is None:
+            continue
+        snap = snap.filter_traces(ignore)
+        stats = snap.compare_to(prev, key)
+        stats.sort(key=lambda s: s.size_diff, reverse=True)
+        out[stage] = [
+            {
+                "where": " <- ".join(f"{fr.filename}:{fr.lineno}" for fr in reversed(s.traceback)),
+                "size_diff_kb": round(s.size_diff / 1024, 1),
+                "count_diff": s.count_diff,
+            }
+            for s in stats[:top]
+        ]
+        prev = snap
+    return out
+
+
+def run_load_test(
+    sessions: int,
+    concurrency: int,
+    banks: List[str],
+    bundle_size: int = 3,
+    llm_latency_ms: float = 500,
+    cascade: Optional[bool] = None,
+    profile_memory: bool = False,
+    top: int = 10,
+    seed: int = 0,
+    tracemalloc_depth: int = 1,
+    fill_ratio: float = 0.8,
+) -> Dict[str, Any]:
+    # pypdf warns about every font quirk in the bank forms; keep the report readable
+    logging.getLogger("pypdf").setLevel(logging.ERROR)
+
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(llm_latency_ms)
+    os.environ.setdefault("FAKE_LLM_FAST_LATENCY_MS", str(llm_latency_ms / 5))
+
+    known = set(load_bank_registry()["bank"].dropna().unique().tolist())
+    unknown = [b for b in banks if b not in known]
+    if unknown:
+        raise ValueError(f"Unknown bank(s): {', '.join(unknown)}")
+
+    forms = _load_forms()
+    fields = list(dict.fromkeys(f for b in banks for f in required_fields_for_bank(b)))
+    rng = random.Random(seed)
+    bundles = [_bundle(forms, bundle_size, fields, fill_ratio, rng) for _ in range(sessions)]
+
+    rss_start = _rss_bytes()
+    sampler = _RssSampler()
+    sampler.start()
+
+    results: List[Dict[str, float]] = []
+    errors: List[str] = []
+
+    def one(bundle: List[Tuple[str, bytes]]) -> None:
+        t0 = time.perf_counter()
+        try:
+            timings = run_session(bundle, banks, cascade=cascade)
+            timings["total"] = time.perf_counter() - t0
+            results.append(timings)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="session") as pool:
+        list(pool.map(one, bundles))
+    wall = time.perf_counter() - t0
+    peak_rss = sampler.stop()
+
+    report: Dict[str, Any] = {
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "banks": banks,
+        "bundle_size": bundle_size,
+        "fill_ratio": fill_ratio,
+        "llm_latency_ms": llm_latency_ms,
+        "completed": len(results),
+        "errors": errors[:10],
+        "wall_s": round(wall, 2),
+        "throughput_sessions_per_min": round(len(results) / wall * 60, 2) if wall else 0.0,
+        "latency_s": {
+            stage: {p: round(_pct([r[stage] for r in results], int(p[1:])), 3) for p in ("p50", "p95", "p99")}
+            for stage in STAGES + ["total"]
+        },
+        "rss_start_mb": round(rss_start / 2**20, 1),
+        "peak_rss_mb": round(max(peak_rss, rss_start) / 2**20, 1),
+        "doc_store": get_document_store().stats(),
+    }
+
+    if profile_memory:
+        # every extra frame multiplies tracing cost; keep 1 unless stacks are wanted
+        tracemalloc.start(max(1, tracemalloc_depth))
+        snapshots: Dict[str, Any] = {}
+        baseline = tracemalloc.take_snapshot()
+        run_session(bundles[0], banks, cascade=cascade, snapshots=snapshots)
+        report["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+        report["allocation_hotspots"] = _hotspots(snapshots, baseline, top, tracemalloc_depth)
+
+    return report
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"{report['completed']}/{report['sessions']} sessions "
+        f"(concurrency {report['concurrency']}, banks {','.join(report['banks'])}, "
+        f"bundle {report['bundle_size']} bank forms + client docs filling {report['fill_ratio']:.0%} of fields, "
+        f"LLM latency {report['llm_latency_ms']}ms)"
+    )
+    print(f"wall {report['wall_s']}s, throughput {report['throughput_sessions_per_min']} sessions/min")
+    print(f"RSS start {report['rss_start_mb']} MB, peak {report['peak_rss_mb']} MB")
+    print("latency (s)      p50      p95      p99")
+    for stage, p in report["latency_s"].items():
+        print(f"  {stage:<10} {p['p50']:>8} {p['p95']:>8} {p['p99']:>8}")
+    if report["errors"]:
+        print("errors:")
+        for e in report["errors"]:
+            print(f"  {e}")
+    if "allocation_hotspots" in report:
+        print(f"tracemalloc peak (one serial session): {report['tracemalloc_peak_mb']} MB")
+        for stage, rows in report["allocation_hotspots"].items():
+            print(f"  [{stage}]")
+            for r in rows:
+                print(f"    {r['size_diff_kb']:>10} KB  {r['count_diff']:>7}  {r['where']}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, default=10, help="total sessions to run")
+    ap.add_argument("--concurrency", type=int, default=4, help="sessions in flight at once")
+    ap.add_argument("--banks", default="", help="comma-separated banks (default: first bank in registry)")
+    ap.add_argument("--bundle-size", type=int, default=3, help="bank-form PDFs per session bundle")
+    ap.add_argument(
+        "--fill-ratio", type=float, default=0.8, help="share of required fields answered by the client documents"
+    )
+    ap.add_argument("--llm-latency-ms", type=float, default=500, help="fake LLM latency per call (strong tier)")
+    ap.add_argument("--cascade", action="store_true", help="use the fast->strong model cascade")
+    ap.add_argument("--tracemalloc", action="store_true", help="report per-stage allocation hotspots")
+    ap.add_argument("--top", type=int, default=10, help="hotspots per stage")
+    ap.add_argument(
+        "--tracemalloc-depth", type=int, default=1, help="frames per allocation (>1 groups hotspots by call stack)"
+    )
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", help="also write the report to this path")
+    args = ap.parse_args()
+
+    banks = [b.strip() for b in args.banks.split(",") if b.strip()]
+    if not banks:
+        banks = sorted(load_bank_registry()["bank"].dropna().unique().tolist())[:1]
+
+    report = run_load_test(
+        sessions=args.sessions,
+        concurrency=args.concurrency,
+        banks=banks,
+        bundle_size=args.bundle_size,
+        llm_latency_ms=args.llm_latency_ms,
+        cascade=True if args.cascade else None,
+        profile_memory=args.tracemalloc,
+        top=args.top,
+        seed=args.seed,
+        tracemalloc_depth=args.tracemalloc_depth,
+        fill_ratio=args.fill_ratio,
+    )
+    _print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"Saved report -> {args.json}")
+
+
+if __name__ == "__main__":
+    main()
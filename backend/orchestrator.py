@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import os
 from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from backend.bank_registry import required_fields_for_bank
-from backend.llm import extract_fields_with_genai
+from backend.evidence_index import EvidenceIndex, get_evidence_index
+from backend.llm import estimate_cost, extract_fields_with_genai, fast_model, strong_model
 from backend.validator import validate
 
 
@@ -35,6 +37,174 @@ def _batch(items: List[str], size: int) -> List[List[str]]:
     return [items[i : i + size] for i in range(0, len(items), size)]
 
 
+def _extract_into(
+    extracted_all: Dict[str, Any],
+    fields: List[str],
+    required: List[str],
+    bank_name: str,
+    pdf_text: str,
+    uploaded_pdfs: Optional[List[Tuple[str, bytes]]],
+    confidence_threshold: float,
+    on_partial_update: Optional[Callable[[str, Dict[str, Any]], None]],
+    batch_size: int,
+    accept: Optional[Callable[[str, Any], bool]] = None,
+    model: Optional[str] = None,
+    tier: Optional[Dict[str, Any]] = None,
+    evidence_index: Optional[EvidenceIndex] = None,
+) -> None:
+    """
+    Ask the model for `fields` in batches and merge answers into `extracted_all`.
+    `accept(field, new_item)` can veto overwriting an existing answer.
+    Per-call usage is accumulated into `tier` when given.
+    """
+    for chunk in _batch(fields, batch_size):
+        usage: Dict[str, Any] = {}
+        extracted = extract_fields_with_genai(
+            pdf_text=pdf_text or "",
+            field_list=chunk,
+            bank_name=bank_name,
+            uploaded_pdfs=uploaded_pdfs,
+            max_output_tokens=2048,
+            model=model,
+            usage=usage,
+        )
+        if tier is not None:
+            tier["calls"] += 1
+            tier["fields"] += len(chunk)
+            tier["latency_s"] += usage.get("latency_s", 0.0)
+            tier["input_tokens"] += usage.get("input_tokens", 0)
+            tier["output_tokens"] += usage.get("output_tokens", 0)
+        # merge
+        for k, v in extracted.items():
+            if accept is None or accept(k, v):
+                extracted_all[k] = v
+
+        # normalize + validate interim so UI can show “missing” correctly
+        missing_now, normalized_now = validate(
+            extracted=extracted_all,
+            required=required,
+            confidence_threshold=confidence_threshold,
+            evidence_index=evidence_index,
+        )
+        if on_partial_update:
+            on_partial_update(bank_name, normalized_now)
+
+
+def cascade_enabled() -> bool:
+    return os.getenv("LLM_CASCADE", "0").lower() in ("1", "true", "yes", "y")
+
+
+# Last observed strong-model latency per call, by model name; used to estimate
+# the latency saved by runs that escalated nothing.
+_STRONG_LATENCY_S: Dict[str, float] = {}
+
+
+def _strong_latency_ratio() -> float:
+    return float(os.getenv("LLM_CASCADE_LATENCY_RATIO", "3.0"))
+
+
+def _new_tier(model: str) -> Dict[str, Any]:
+    return {"model": model, "calls": 0, "fields": 0, "latency_s": 0.0, "input_tokens": 0, "output_tokens": 0}
+
+
+def _tier_summary(fast: Optional[Dict[str, Any]], strong: Dict[str, Any], escalated: List[str]) -> Dict[str, Any]:
+    """
+    Per-tier usage plus the net saving versus a strong-model-only run: the
+    fast tier's calls priced on the strong model, minus what both tiers
+    actually spent (escalations included, so it can go negative). Latency
+    saved uses the strong model's per-call latency from this run, else the
+    last one observed in this process, else the fast per-call latency times
+    LLM_CASCADE_LATENCY_RATIO (saved["latency_estimate"] says which).
+    """
+    tiers = [t for t in (fast, strong) if t is not None]
+    for t in tiers:
+        t["latency_s"] = round(t["latency_s"], 3)
+        t["cost_usd"] = round(estimate_cost(t["model"], t["input_tokens"], t["output_tokens"]), 6)
+    if strong["calls"]:
+        _STRONG_LATENCY_S[strong["model"]] = strong["latency_s"] / strong["calls"]
+
+    saved: Dict[str, Any] = {"cost_usd": 0.0, "latency_s": None, "latency_estimate": None}
+    if fast is not None and fast["calls"]:
+        as_strong = estimate_cost(strong["model"], fast["input_tokens"], fast["output_tokens"])
+        saved["cost_usd"] = round(as_strong - (fast["cost_usd"] + strong["cost_usd"]), 6)
+        if strong["calls"]:
+            per_call, source = strong["latency_s"] / strong["calls"], "observed"
+        elif strong["model"] in _STRONG_LATENCY_S:
+            per_call, source = _STRONG_LATENCY_S[strong["model"]], "last_observed"
+        else:
+            per_call, source = fast["latency_s"] / fast["calls"] * _strong_latency_ratio(), "ratio"
+        saved["latency_s"] = round(per_call * fast["calls"] - (fast["latency_s"] + strong["latency_s"]), 3)
+        saved["latency_estimate"] = source
+
+    return {
+        "fast": fast,
+        "strong": strong,
+        "escalated_fields": escalated,
+        "saved": saved,
+    }
+
+
+def _extract_tiered(
+    extracted_all: Dict[str, Any],
+    fields: List[str],
+    required: List[str],
+    bank_name: str,
+    pdf_text: str,
+    uploaded_pdfs: Optional[List[Tuple[str, bytes]]],
+    confidence_threshold: float,
+    on_partial_update: Optional[Callable[[str, Dict[str, Any]], None]],
+    batch_size: int,
+    cascade: bool,
+    accept: Optional[Callable[[str, Any], bool]] = None,
+    evidence_index: Optional[EvidenceIndex] = None,
+) -> Dict[str, Any]:
+    """
+    Without cascade every chunk goes to the strong model (GEMINI_MODEL).
+    With cascade every chunk goes to the fast model (GEMINI_FAST_MODEL) first,
+    and only fields validate() flags as missing / low_confidence /
+    invalid_format are re-asked on the strong model.
+    Returns per-tier stats.
+    """
+    strong = _new_tier(strong_model())
+    common = dict(
+        required=required,
+        bank_name=bank_name,
+        pdf_text=pdf_text,
+        uploaded_pdfs=uploaded_pdfs,
+        confidence_threshold=confidence_threshold,
+        on_partial_update=on_partial_update,
+        batch_size=batch_size,
+        evidence_index=evidence_index,
+    )
+
+    if not cascade or fast_model() == strong["model"]:
+        _extract_into(extracted_all, fields=fields, accept=accept, model=strong["model"], tier=strong, **common)
+        return _tier_summary(None, strong, [])
+
+    fast = _new_tier(fast_model())
+    _extract_into(extracted_all, fields=fields, accept=accept, model=fast["model"], tier=fast, **common)
+
+    flagged, fast_answers = validate(
+        extracted=extracted_all,
+        required=fields,
+        confidence_threshold=confidence_threshold,
+        evidence_index=evidence_index,
+    )
+    escalated = list(flagged)
+    if escalated:
+        def accept_strong(k: str, v: Any) -> bool:
+            # only replace the fast answer when the strong one is at least as confident
+            if k not in escalated or not _better(fast_answers.get(k), v):
+                return False
+            return accept is None or accept(k, v)
+
+        _extract_into(
+            extracted_all, fields=escalated, accept=accept_strong, model=strong["model"], tier=strong, **common
+        )
+
+    return _tier_summary(fast, strong, escalated)
+
+
 def process_bank(
     bank_name: str,
     pdf_text: str,
@@ -42,11 +212,15 @@ def process_bank(
     uploaded_pdfs: Optional[List[Tuple[str, bytes]]] = None,
     on_partial_update: Optional[Callable[[str, Dict[str, Any]], None]] = None,
     batch_size: int = 25,
+    cascade: Optional[bool] = None,
 ) -> Dict[str, Any]:
     """
     1) Load required fields for bank (canonical_key if available else bank_label)
-    2) Extract fields via Gemini multimodal (prompt + attached PDFs)
-    3) Validate & flag missing/low-confidence/invalid_format
+    2) Extract fields via Gemini multimodal (prompt + attached PDFs);
+       with cascade (default: LLM_CASCADE env) fast model first, strong model
+       only for flagged fields
+    3) Validate & flag missing/low-confidence/invalid_format, checking evidence
+       snippets against pdf_text (ungrounded answers are downgraded)
     4) Return structured payload
     """
     required = _clean_required_fields(required_fields_for_bank(bank_name))
@@ -59,37 +233,152 @@ def process_bank(
         }
 
     extracted_all: Dict[str, Any] = {}
+    evidence_index = get_evidence_index(pdf_text) if pdf_text else None
 
-    for chunk in _batch(required, batch_size):
-        extracted = extract_fields_with_genai(
-            pdf_text=pdf_text or "",
-            field_list=chunk,
+    tier_stats = _extract_tiered(
+        extracted_all,
+        fields=required,
+        required=required,
+        bank_name=bank_name,
+        pdf_text=pdf_text,
+        uploaded_pdfs=uploaded_pdfs,
+        confidence_threshold=confidence_threshold,
+        on_partial_update=on_partial_update,
+        batch_size=batch_size,
+        cascade=cascade_enabled() if cascade is None else cascade,
+        evidence_index=evidence_index,
+    )
+
+    missing, normalized = validate(
+        extracted=extracted_all,
+        required=required,
+        confidence_threshold=confidence_threshold,
+        evidence_index=evidence_index,
+    )
+
+    return {
+        "bank": bank_name,
+        "fields": normalized,
+        "missing_fields": missing,
+        "required_fields": required,
+        "tier_stats": tier_stats,
+    }
+
+
+def _is_settled(item: Any) -> bool:
+    """
+    A field is settled when the advisor typed it in, or when it is present,
+    confident and well-formed. Settled fields are never re-queried.
+    """
+    if not isinstance(item, dict):
+        return False
+    if item.get("evidence") == "manual_input":
+        return True
+    flags = item.get("flags", {}) or {}
+    return not (flags.get("missing") or flags.get("low_confidence") or flags.get("invalid_format"))
+
+
+def _better(old: Any, new: Any) -> bool:
+    """Should a fresh answer replace the one we already have?"""
+    new_value = new.get("value") if isinstance(new, dict) else new
+    if new_value in (None, "", []):
+        return False
+    if not isinstance(old, dict) or old.get("value") in (None, "", []):
+        return True
+    try:
+        new_conf = float(new.get("confidence", 0.0)) if isinstance(new, dict) else 0.0
+        old_conf = float(old.get("confidence", 0.0))
+    except Exception:
+        return True
+    return new_conf >= old_conf or (old.get("flags", {}) or {}).get("invalid_format", False)
+
+
+def process_bank_incremental(
+    bank_name: str,
+    previous: Dict[str, Any],
+    new_pdf_text: str,
+    new_uploaded_pdfs: Optional[List[Tuple[str, bytes]]] = None,
+    context_text: str = "",
+    earlier_uploaded_pdfs: Optional[List[Tuple[str, bytes]]] = None,
+    confidence_threshold: float = 0.6,
+    on_partial_update: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    batch_size: int = 25,
+    context_chars: int = 2000,
+    cascade: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """
+    Delta re-extraction after documents are added mid-session.
+
+    1) Start from the previous payload for this bank
+    2) Re-ask only fields that are still missing / low_confidence / invalid_format
+       (manual chat inputs and confident values are kept as-is)
+    3) Send only the new documents, plus the first `context_chars` of the
+       earlier text as context
+    4) Keep a new answer only if it improves on the old one, then re-validate
+
+    `context_text` / `earlier_uploaded_pdfs` are the documents already
+    extracted. Without a usable previous payload this is a full process_bank
+    run over the earlier and the new documents together.
+    """
+    all_text = "\n\n".join(t for t in (context_text, new_pdf_text) if t)
+    if not previous or previous.get("error") or not previous.get("fields"):
+        return process_bank(
             bank_name=bank_name,
-            uploaded_pdfs=uploaded_pdfs,
-            max_output_tokens=2048,
+            pdf_text=all_text,
+            confidence_threshold=confidence_threshold,
+            uploaded_pdfs=(earlier_uploaded_pdfs or []) + (new_uploaded_pdfs or []),
+            on_partial_update=on_partial_update,
+            batch_size=batch_size,
+            cascade=cascade,
         )
-        # merge
-        for k, v in extracted.items():
-            extracted_all[k] = v
 
-        # normalize + validate interim so UI can show “missing” correctly
-        missing_now, normalized_now = validate(
-            extracted=extracted_all,
+    required = previous.get("required_fields") or list(previous["fields"].keys())
+    # validate() re-derives flags from value/confidence/evidence, so the previous
+    # normalized entries can be fed straight back in.
+    extracted_all: Dict[str, Any] = dict(previous["fields"])
+
+    evidence_index = get_evidence_index(all_text) if all_text else None
+
+    pending = [f for f in required if not _is_settled(extracted_all.get(f))]
+    tier_stats = None
+    if pending:
+        context = (context_text or "")[:context_chars]
+        pdf_text = new_pdf_text or ""
+        if context:
+            pdf_text = f"### EARLIER DOCUMENTS (excerpt, for context only)\n{context}\n\n{pdf_text}"
+
+        tier_stats = _extract_tiered(
+            extracted_all,
+            fields=pending,
             required=required,
+            bank_name=bank_name,
+            pdf_text=pdf_text,
+            uploaded_pdfs=new_uploaded_pdfs,
             confidence_threshold=confidence_threshold,
+            on_partial_update=on_partial_update,
+            batch_size=batch_size,
+            cascade=cascade_enabled() if cascade is None else cascade,
+            accept=lambda k, v: k in pending and _better(previous["fields"].get(k), v),
+            evidence_index=evidence_index,
         )
-        if on_partial_update:
-            on_partial_update(bank_name, normalized_now)
 
     missing, normalized = validate(
         extracted=extracted_all,
         required=required,
         confidence_threshold=confidence_threshold,
+        evidence_index=evidence_index,
     )
+    # Manual inputs were saved with all flags cleared; keep them that way.
+    for f, item in previous["fields"].items():
+        if isinstance(item, dict) and item.get("evidence") == "manual_input" and f in normalized:
+            normalized[f] = item
+    missing = [f for f in missing if not _is_settled(normalized.get(f))]
 
     return {
         "bank": bank_name,
         "fields": normalized,
         "missing_fields": missing,
         "required_fields": required,
+        "requeried_fields": pending,
+        "tier_stats": tier_stats,
     }
@@ -12,7 +12,7 @@ def extract_text_from_uploads(
     """Extract text from uploaded PDF files (Streamlit UploadedFile objects).
 
     Returns:
-        combined_text: concatenated text with file headers
+        combined_text: concatenated text with file headers, pages separated by form feeds
         names: list of filenames in the order processed
     """
     uploads = list(uploads or [])
@@ -30,7 +30,8 @@ def extract_text_from_uploads(
         txt_parts = []
         for page in reader.pages:
             txt_parts.append(page.extract_text() or "")
-        text = "\n".join(txt_parts).strip()
+        # form feed between pages so evidence can be traced back to a page
+        text = "\n\f\n".join(t.strip() for t in txt_parts)
 
         parts.append(f"\n\n### FILE: {name}\n{text}")
 
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Optional
 import re
 from datetime import datetime
 
+from backend.evidence_index import EvidenceIndex
+
 
 def _is_email(x: str) -> bool:
     return bool(re.match(r"^[^\s@]+@[^\s@]+\.[^\s@]+$", x))
@@ -31,7 +33,16 @@ def validate(
     extracted: Dict[str, Any],
     required: List[str],
     confidence_threshold: float = 0.6,
+    evidence_index: Optional[EvidenceIndex] = None,
 ) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Normalize extracted items and flag missing / low_confidence / invalid_format.
+
+    With an evidence_index, each evidence snippet is looked up in the document
+    text and its file/page attached as `source`. Answers whose evidence cannot
+    be found are flagged `ungrounded`; when every document has a text layer
+    they are also downgraded to low_confidence.
+    """
     normalized: Dict[str, Any] = {}
 
     for field in required:
@@ -54,6 +65,7 @@ def validate(
             "missing": value in (None, "", []),
             "low_confidence": conf < confidence_threshold,
             "invalid_format": False,
+            "ungrounded": False,  # only set when the evidence was actually checked
         }
 
         if isinstance(value, str) and value.strip():
@@ -67,7 +79,16 @@ def validate(
             elif "date" in lname or "dob" in lname:
                 flags["invalid_format"] = not _is_date(value)
 
+        source = None
+        if evidence_index and ev and ev != "manual_input" and not flags["missing"]:
+            source = evidence_index.locate(ev)
+            flags["ungrounded"] = source is None
+            if source is None and evidence_index.complete:
+                flags["low_confidence"] = True
+
         normalized[field] = {"value": value, "confidence": conf, "evidence": ev, "flags": flags}
+        if source is not None:
+            normalized[field]["source"] = source
 
     missing = [
         f for f in required